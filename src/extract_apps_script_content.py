@@ -5,42 +5,50 @@ Extracts content only from the main article area (green box),
 excluding the "En esta página" sidebar (red box).
 """
 
+import argparse
 import asyncio
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup, NavigableString
+import orjson
+from lxml import etree
 from playwright.async_api import async_playwright
 
+from extract_apps_script_urls import (
+    close_worker_page,
+    create_http_client,
+    fetch_page_html,
+    find_main_container,
+    load_page_html,
+    load_storage_state,
+    new_worker_page,
+    parse_html,
+    remove_sidebar_content,
+    save_storage_state,
+)
+
 ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = ROOT / "output"
 
-URLS_FILE = OUTPUT_DIR / "apps_script_urls.md"
-
+URLS_FILE = OUTPUT_DIR / "apps_script_urls.json"
 
-def get_main_container(soup: BeautifulSoup):
-    selectors = ["main", "article", ".devsite-article", ".devsite-article-body"]
-    for selector in selectors:
-        node = soup.select_one(selector)
-        if node:
-            return node
-    return soup.body
+CONCURRENCY = 8
 
-
-def remove_sidebar_content(main):
-    if not main:
-        return
-    for selector in [
-        ".devsite-on-this-page",
-        ".devsite-toc",
-        ".devsite-nav",
-        ".devsite-breadcrumb-nav",
-        "nav",
-        "aside",
-    ]:
-        for node in main.select(selector):
-            node.decompose()
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+# Paragraphs and nested items inside a list item, and code inside <pre>, are already part of
+# their container's text, so they are filtered out in the query rather than in Python.
+# One descendant:: walk with a self:: predicate visits each node once and yields document
+# order directly; a union of per-tag paths (or .//*) makes libxml2 merge-sort node sets.
+BLOCKS_XPATH = etree.XPath(
+    "descendant::*["
+    "self::h1 or self::h2 or self::h3 or self::h4 or self::h5 or self::h6 or self::pre"
+    " or ((self::p or self::li) and not(ancestor::li))"
+    " or (self::code and not(ancestor::pre))"
+    "]"
+)
 
 
 def normalize_whitespace(text: str) -> str:
@@ -48,140 +56,174 @@ def normalize_whitespace(text: str) -> str:
 
 
 def extract_markdown_from_main(main) -> str:
-    if not main:
+    if main is None:
         return ""
     lines = []
-    for elem in main.find_all(
-        ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "pre", "code"],
-        recursive=True,
-    ):
-        if elem.name in {"h1", "h2", "h3", "h4", "h5", "h6"}:
-            level = int(elem.name[1])
-            heading_text = normalize_whitespace(elem.get_text(" ", strip=True))
+    for elem in BLOCKS_XPATH(main):
+        if elem.tag in HEADING_TAGS:
+            level = int(elem.tag[1])
+            heading_text = normalize_whitespace(" ".join(elem.itertext()))
             if heading_text:
                 lines.append(f"{'#' * level} {heading_text}")
-        elif elem.name == "pre":
-            code_text = elem.get_text("\n", strip=False)
+        elif elem.tag == "pre":
+            code_text = elem.text_content()
             if code_text.strip():
                 lines.append("```")
                 lines.append(code_text.rstrip())
                 lines.append("```")
-        elif elem.name == "code":
-            if elem.parent and elem.parent.name == "pre":
-                continue
-            code_text = elem.get_text(" ", strip=True)
+        elif elem.tag == "code":
+            code_text = normalize_whitespace(" ".join(elem.itertext()))
             if code_text:
                 lines.append(f"`{code_text}`")
-        elif elem.name == "li":
-            text = normalize_whitespace(elem.get_text(" ", strip=True))
+        elif elem.tag == "li":
+            text = normalize_whitespace(" ".join(elem.itertext()))
             if text:
                 lines.append(f"- {text}")
         else:
-            text = normalize_whitespace(elem.get_text(" ", strip=True))
+            text = normalize_whitespace(" ".join(elem.itertext()))
             if text:
                 lines.append(text)
 
-    cleaned = []
-    last_blank = False
-    for line in lines:
-        if not line:
-            if not last_blank:
-                cleaned.append("")
-            last_blank = True
-            continue
-        cleaned.append(line)
-        last_blank = False
+    return "\n".join(lines).strip()
 
-    return "\n".join(cleaned).strip()
 
+def flatten_sections(sections: dict) -> list:
+    return [
+        {"section": section, "name": item["name"], "url": item["url"]}
+        for section, items in sections.items()
+        for item in items
+    ]
 
-def parse_urls_from_markdown(urls_file: Path):
-    urls = []
-    current_section = "General"
+
+def load_url_index(urls_file: Path) -> list:
     if not urls_file.exists():
-        return urls
-    for line in urls_file.read_text(encoding="utf-8").splitlines():
-        if line.startswith("## ") and not line.startswith("## Table"):
-            current_section = line[3:].strip()
-        elif line.startswith("- ["):
-            if "](" in line and line.endswith(")"):
-                name = line.split("[", 1)[1].split("]", 1)[0]
-                url = line.split("(", 1)[1].rsplit(")", 1)[0]
-                urls.append({"section": current_section, "name": name, "url": url})
-    return urls
-
-
-async def extract_page_content(page, url: str):
-    await page.goto(url, wait_until="domcontentloaded", timeout=90000)
-    await asyncio.sleep(3)
-    html = await page.content()
-    soup = BeautifulSoup(html, "html.parser")
-    main = get_main_container(soup)
+        return []
+    return flatten_sections(orjson.loads(urls_file.read_bytes()))
+
+
+def parse_and_extract(html: str, fallback_to_body: bool = False):
+    # Runs in a worker process: module-level and str -> str so it pickles.
+    # Returns None when the page has no populated article and the body fallback is off.
+    tree = parse_html(html)
+    main = find_main_container(tree)
+    if main is None or not main.text_content().strip():
+        if not fallback_to_body:
+            return None
+        if main is None and tree is not None:
+            main = tree.body
     remove_sidebar_content(main)
     return extract_markdown_from_main(main)
 
 
-def generate_content_document(sections: dict, output_file: Path):
-    doc = "# Google Apps Script (ES-419) - Complete Content\n\n"
-    doc += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-    doc += "## Table of Contents\n\n"
-    total = 0
-    for section, items in sections.items():
-        count = len(items)
-        total += count
-        anchor = section.lower().replace(" ", "-")
-        doc += f"- [{section}](#{anchor}) ({count})\n"
-    doc += f"\n**Total: {total} items**\n\n"
-    doc += "---\n\n"
-
-    for section, items in sections.items():
-        doc += f"## {section}\n\n"
-        for item in items:
-            doc += f"### {item['name']}\n\n"
-            doc += item["content"].strip() + "\n\n"
-            doc += "---\n\n"
-
-    output_file.write_text(doc, encoding="utf-8")
+async def extract_page_content(client, page, process_pool, url: str):
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(process_pool, parse_and_extract, await fetch_page_html(client, url))
+    if content is None:
+        html = await load_page_html(page, url)
+        content = await loop.run_in_executor(process_pool, parse_and_extract, html, True)
+    return content
+
+
+async def crawl_worker(client, browser, storage_state, process_pool, queue: asyncio.Queue, results: dict, total: int):
+    context, page = await new_worker_page(browser, storage_state)
+    try:
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            label = f"  [{index + 1}/{total}] {item['name'][:40]}..."
+            try:
+                results[item["url"]] = await extract_page_content(client, page, process_pool, item["url"])
+                print(f"{label} [OK]")
+            except Exception as exc:
+                print(f"{label} [FAIL] {str(exc)[:50]}")
+    finally:
+        state = await close_worker_page(context, page)
+    return state
+
+
+def open_output(output_file: Path, compress: bool):
+    if compress:
+        return gzip.open(output_file, "wt", encoding="utf-8", compresslevel=6)
+    return output_file.open("w", encoding="utf-8", buffering=1 << 20)
+
+
+def generate_content_document(sections: dict, output_file: Path, compress: bool = False):
+    if compress:
+        output_file = output_file.with_name(output_file.name + ".gz")
+    total = sum(len(items) for items in sections.values())
+    anchors = {section: section.lower().replace(" ", "-") for section in sections}
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M")
+    with open_output(output_file, compress) as f:
+        f.write("# Google Apps Script (ES-419) - Complete Content\n\n")
+        f.write(f"Generated: {generated}\n\n")
+        f.write("## Table of Contents\n\n")
+        for section, items in sections.items():
+            f.write(f"- [{section}](#{anchors[section]}) ({len(items)})\n")
+        f.write(f"\n**Total: {total} items**\n\n")
+        f.write("---\n\n")
+
+        for section, items in sections.items():
+            f.write(f"## {section}\n\n")
+            for item in items:
+                f.write(f"### {item['name']}\n\n{item['content'].strip()}\n\n---\n\n")
+
     size_mb = output_file.stat().st_size / (1024 * 1024)
     print(f"[OK] Saved: {output_file.name} ({total} items, {size_mb:.2f} MB)")
 
 
-async def main():
+async def extract_contents(urls_to_crawl: list, client, browser) -> dict:
+    # Hub pages often link the same page from several sections; fetch each URL only once.
+    seen = set()
+    queue = asyncio.Queue()
+    for item in urls_to_crawl:
+        if item["url"] in seen:
+            continue
+        queue.put_nowait((len(seen), item))
+        seen.add(item["url"])
+
+    results = {}
+    total = len(seen)
+    workers = min(CONCURRENCY, total)
+    # Fetching stays on the event loop; parsing runs on all cores while the next pages download.
+    storage_state = load_storage_state()
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as process_pool:
+        states = await asyncio.gather(
+            *(crawl_worker(client, browser, storage_state, process_pool, queue, results, total) for _ in range(workers))
+        )
+    save_storage_state(states)
+
+    sections = {}
+    for item in urls_to_crawl:
+        if item["url"] in results:
+            sections.setdefault(item["section"], []).append(
+                {
+                    "name": item["name"],
+                    "url": item["url"],
+                    "content": results[item["url"]],
+                }
+            )
+    return sections
+
+
+async def main(compress: bool = False):
     print("=" * 60)
     print("GOOGLE APPS SCRIPT - CONTENT EXTRACTOR")
     print("=" * 60)
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    urls_to_crawl = parse_urls_from_markdown(URLS_FILE)
+    urls_to_crawl = load_url_index(URLS_FILE)
     if not urls_to_crawl:
-        print("[ERROR] apps_script_urls.md not found or empty. Run extract_apps_script_urls.py first.")
+        print("[ERROR] apps_script_urls.json not found or empty. Run extract_apps_script_urls.py first.")
         return
 
-    sections = {}
-    async with async_playwright() as p:
+    async with create_http_client() as client, async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-
-        for index, item in enumerate(urls_to_crawl, start=1):
-            try:
-                print(f"  [{index}/{len(urls_to_crawl)}] {item['name'][:40]}...", end=" ", flush=True)
-                content = await extract_page_content(page, item["url"])
-                section = item["section"]
-                sections.setdefault(section, []).append(
-                    {
-                        "name": item["name"],
-                        "url": item["url"],
-                        "content": content,
-                    }
-                )
-                print("[OK]")
-            except Exception as exc:
-                print(f"[FAIL] {str(exc)[:50]}")
-            await asyncio.sleep(0.5)
-
+        sections = await extract_contents(urls_to_crawl, client, browser)
         await browser.close()
 
-    generate_content_document(sections, OUTPUT_DIR / "apps_script_content.md")
+    generate_content_document(sections, OUTPUT_DIR / "apps_script_content.md", compress=compress)
 
     print("\n" + "=" * 60)
     print("[OK] Content extraction complete!")
@@ -189,4 +231,6 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Extract Google Apps Script (ES-419) page content.")
+    parser.add_argument("--gzip", action="store_true", help="write apps_script_content.md.gz instead of .md")
+    asyncio.run(main(compress=parser.parse_args().gzip))
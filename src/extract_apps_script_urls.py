@@ -12,13 +12,23 @@ Sources:
 """
 
 import asyncio
+import random
 from datetime import datetime
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
-
-from bs4 import BeautifulSoup
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import hishel
+import httpx
+import lxml.html
+import orjson
+from aiolimiter import AsyncLimiter
+from lxml import etree
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from playwright.async_api import async_playwright
 
+from xpath_helpers import has_class
+
 ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = ROOT / "output"
 
@@ -36,29 +46,125 @@ ALLOWED_PREFIXES = (
     "https://developers.google.com/apps-script/samples",
 )
 
+CONCURRENCY = 8
+
+MAIN_SELECTORS = ["main", "article", ".devsite-article", ".devsite-article-body"]
+MAIN_SELECTOR = ",".join(MAIN_SELECTORS)
+
+HTTP_HEADERS = {
+    "Accept-Language": "es-419,es;q=0.9",
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+}
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+
+# Emptied while parsing: none of them carry article text.
+PRUNED_TAGS = ("script", "style", "noscript", "svg", "template", "iframe", "nav", "aside")
+PARSE_CHUNK_SIZE = 64 * 1024
+
+
+# Same priority as MAIN_SELECTORS: the first expression that matches wins.
+MAIN_CONTAINER_XPATHS = tuple(
+    etree.XPath(xpath)
+    for xpath in (
+        "//main",
+        "//article",
+        f"//*[{has_class('devsite-article')}]",
+        f"//*[{has_class('devsite-article-body')}]",
+    )
+)
+SIDEBAR_XPATH = etree.XPath(
+    f".//*[{has_class('devsite-on-this-page')}]"
+    f" | .//*[{has_class('devsite-toc')}]"
+    f" | .//*[{has_class('devsite-nav')}]"
+    f" | .//*[{has_class('devsite-breadcrumb-nav')}]"
+    " | .//nav | .//aside"
+)
+LINK_XPATH = etree.XPath(".//a[@href]")
+
+# Requests Playwright aborts when a page has to be rendered: none of them affect the text.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet", "other"})
+BLOCKED_HOSTS = frozenset({"www.google-analytics.com", "www.googletagmanager.com"})
+
+# Cookies/localStorage saved from rendered pages so consent banners do not re-run every session.
+STORAGE_STATE_FILE = OUTPUT_DIR / ".pw_state.json"
+
+HTTP_CACHE_DIR = OUTPUT_DIR / ".http_cache"
+HTTP_CACHE_TTL = 24 * 60 * 60
+
+# Politeness: requests per second per host, plus retries with jittered exponential backoff.
+REQUESTS_PER_SECOND = 8
+MAX_RETRIES = 3
+RETRY_STATUS_CODES = frozenset({429, 503})
+
+HOST_LIMITERS = {}
+
+
+def host_limiter(url: str) -> AsyncLimiter:
+    host = urlsplit(url).hostname or ""
+    if host not in HOST_LIMITERS:
+        HOST_LIMITERS[host] = AsyncLimiter(REQUESTS_PER_SECOND, 1.0)
+    return HOST_LIMITERS[host]
+
 
-def get_main_container(soup: BeautifulSoup):
-    selectors = ["main", "article", ".devsite-article", ".devsite-article-body"]
-    for selector in selectors:
-        node = soup.select_one(selector)
-        if node:
-            return node
-    return soup.body
+async def backoff(attempt: int):
+    await asyncio.sleep(2 ** attempt + random.random())
+
+
+class RateLimitedTransport(httpx.AsyncHTTPTransport):
+    # Sits below the cache, so only requests that actually reach the network are throttled.
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await host_limiter(str(request.url)).acquire()
+        return await super().handle_async_request(request)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    # DevSite answers with Cache-Control: max-age=0, so force caching and rely on a local TTL.
+    # 404s are cached too so dead links do not hit the network on every run.
+    return hishel.AsyncCacheClient(
+        storage=hishel.AsyncFileStorage(base_path=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL),
+        controller=hishel.Controller(force_cache=True, cacheable_status_codes=[200, 301, 404]),
+        transport=RateLimitedTransport(http2=True, limits=HTTP_LIMITS),
+        headers=HTTP_HEADERS,
+        timeout=30,
+        follow_redirects=True,
+    )
+
+
+def parse_html(html: str):
+    if not html or not html.strip():
+        return None
+    # Feed the page in chunks and empty pruned subtrees as soon as they close, so the
+    # retained tree is mostly the article instead of the whole DevSite shell.
+    parser = etree.HTMLPullParser(events=("end",), tag=PRUNED_TAGS, remove_comments=True)
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    for start in range(0, len(html), PARSE_CHUNK_SIZE):
+        parser.feed(html[start:start + PARSE_CHUNK_SIZE])
+        for _, element in parser.read_events():
+            element.clear(keep_tail=True)
+    root = parser.close()
+    for _, element in parser.read_events():
+        element.clear(keep_tail=True)
+    return root
+
+
+def find_main_container(tree):
+    if tree is None:
+        return None
+    for xpath in MAIN_CONTAINER_XPATHS:
+        nodes = xpath(tree)
+        if nodes:
+            return nodes[0]
+    return None
 
 
 def remove_sidebar_content(main):
-    if not main:
+    if main is None:
         return
-    for selector in [
-        ".devsite-on-this-page",
-        ".devsite-toc",
-        ".devsite-nav",
-        ".devsite-breadcrumb-nav",
-        "nav",
-        "aside",
-    ]:
-        for node in main.select(selector):
-            node.decompose()
+    for node in SIDEBAR_XPATH(main):
+        node.drop_tree()
 
 
 def is_allowed_url(url: str) -> bool:
@@ -71,37 +177,150 @@ def is_allowed_url(url: str) -> bool:
     return url.startswith("/apps-script")
 
 
-def extract_page_title(main, soup, url: str) -> str:
-    if main:
-        h1 = main.find("h1")
-        if h1 and h1.get_text(strip=True):
-            return h1.get_text(strip=True)
-    title = soup.title.get_text(strip=True) if soup.title else url
-    return title or url
+def extract_page_title(main, tree, url: str) -> str:
+    if main is not None:
+        h1 = main.find(".//h1")
+        if h1 is not None:
+            text = " ".join(h1.text_content().split())
+            if text:
+                return text
+    title = tree.findtext(".//title") if tree is not None else None
+    return " ".join(title.split()) if title and title.strip() else url
+
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+
+
+async def fetch_page_html(client: httpx.AsyncClient, url: str) -> str:
+    request_url = canonical_url(url)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = await client.get(request_url)
+        except httpx.HTTPError:
+            return ""
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+            break
+        await backoff(attempt)
+    if response.status_code == 404:
+        raise RuntimeError(f"HTTP 404: {url}")
+    if response.status_code in RETRY_STATUS_CODES:
+        # Still rate limited after every retry: rendering the page would only hit the host again.
+        raise RuntimeError(f"HTTP {response.status_code}: {url}")
+    if response.status_code != 200:
+        return ""
+    return response.text
+
+
+async def block_static_assets(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or urlsplit(request.url).hostname in BLOCKED_HOSTS:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def load_storage_state():
+    try:
+        state = orjson.loads(STORAGE_STATE_FILE.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, orjson.JSONDecodeError):
+        state = None
+    if not isinstance(state, dict):
+        # Unreadable state only costs a consent banner; drop it instead of failing every worker.
+        STORAGE_STATE_FILE.unlink(missing_ok=True)
+        return None
+    return state
+
+
+def save_storage_state(states):
+    # Workers finish together, so the state is written once after they are done, from the
+    # last context that rendered a page, through a temp file so readers never see a partial one.
+    state = next((state for state in reversed(states) if state), None)
+    if state is None:
+        return
+    tmp_path = STORAGE_STATE_FILE.with_name(STORAGE_STATE_FILE.name + ".tmp")
+    tmp_path.write_bytes(orjson.dumps(state))
+    tmp_path.replace(STORAGE_STATE_FILE)
+
+
+async def new_worker_page(browser, storage_state=None):
+    context = await browser.new_context(storage_state=storage_state)
+    await context.route("**/*", block_static_assets)
+    page = await context.new_page()
+    return context, page
+
+
+async def close_worker_page(context, page):
+    # Only contexts that actually rendered a page have state worth keeping.
+    try:
+        if page.url != "about:blank":
+            return await context.storage_state()
+    except PlaywrightError:
+        pass
+    finally:
+        await context.close()
+    return None
+
+
+async def load_page_html(page, url: str) -> str:
+    for attempt in range(MAX_RETRIES + 1):
+        await host_limiter(url).acquire()
+        try:
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        except PlaywrightError:
+            if attempt == MAX_RETRIES:
+                raise
+        else:
+            # goto does not raise on error statuses, so rate limiting is checked here.
+            if response is None or response.status not in RETRY_STATUS_CODES:
+                break
+            if attempt == MAX_RETRIES:
+                raise RuntimeError(f"HTTP {response.status}: {url}")
+        await backoff(attempt)
+    try:
+        await page.wait_for_selector(MAIN_SELECTOR, state="attached", timeout=10000)
+    except PlaywrightTimeoutError:
+        pass
+    return await page.content()
+
+
+async def load_main_container(client: httpx.AsyncClient, page, url: str):
+    # DevSite serves the article in the initial HTML; render with Playwright only when it is missing.
+    tree = parse_html(await fetch_page_html(client, url))
+    main = find_main_container(tree)
+    if main is None or not main.text_content().strip():
+        tree = parse_html(await load_page_html(page, url))
+        main = find_main_container(tree)
+        if main is None and tree is not None:
+            main = tree.body
+    remove_sidebar_content(main)
+    return tree, main
 
 
-async def extract_page_urls(page, url: str):
-    await page.goto(url, wait_until="domcontentloaded", timeout=90000)
-    await asyncio.sleep(3)
-    html = await page.content()
-    soup = BeautifulSoup(html, "html.parser")
-    main = get_main_container(soup)
-    remove_sidebar_content(main)
-    title = extract_page_title(main, soup, url)
+async def extract_page_urls(client: httpx.AsyncClient, page, url: str):
+    tree, main = await load_main_container(client, page, url)
+    title = extract_page_title(main, tree, url)
 
     seen = set()
     items = []
-    if not main:
+    if main is None:
         return title, items
 
-    for link in main.find_all("a", href=True):
-        text = link.get_text(strip=True)
+    parts = urlsplit(url)
+    scheme_host = f"{parts.scheme}://{parts.netloc}"
+    for link in LINK_XPATH(main):
+        text = " ".join(link.text_content().split())
         href = link.get("href", "").strip()
         if not text or not href:
             continue
         if not is_allowed_url(href):
             continue
-        full_url = urljoin(url, href)
+        # is_allowed_url only passes absolute URLs and /apps-script paths
+        full_url = href if href.startswith("http") else scheme_host + href
         if full_url in seen:
             continue
         seen.add(full_url)
@@ -110,52 +329,85 @@ async def extract_page_urls(page, url: str):
     return title, items
 
 
+async def crawl_worker(client: httpx.AsyncClient, browser, storage_state, queue: asyncio.Queue, results: dict):
+    context, page = await new_worker_page(browser, storage_state)
+    try:
+        while True:
+            try:
+                index, url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                title, items = await extract_page_urls(client, page, url)
+                results[index] = (title, items)
+                print(f"[OK] {title}: {len(items)} URLs")
+            except Exception as exc:
+                print(f"[FAIL] {url}: {exc}")
+    finally:
+        state = await close_worker_page(context, page)
+    return state
+
+
 def generate_url_document(sections: dict, output_file: Path):
-    doc = "# Google Apps Script (ES-419) - URL Index\n\n"
-    doc += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-    doc += "## Table of Contents\n\n"
-    total = 0
-    for section, items in sections.items():
-        count = len(items)
-        total += count
-        anchor = section.lower().replace(" ", "-")
-        doc += f"- [{section}](#{anchor}) ({count})\n"
-    doc += f"\n**Total: {total} items**\n\n"
-    doc += "---\n\n"
-
-    for section, items in sections.items():
-        doc += f"## {section}\n\n"
-        for item in items:
-            doc += f"- [{item['name']}]({item['url']})\n"
-        doc += "\n"
-
-    output_file.write_text(doc, encoding="utf-8")
+    total = sum(len(items) for items in sections.values())
+    anchors = {section: section.lower().replace(" ", "-") for section in sections}
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M")
+    with output_file.open("w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write("# Google Apps Script (ES-419) - URL Index\n\n")
+        f.write(f"Generated: {generated}\n\n")
+        f.write("## Table of Contents\n\n")
+        for section, items in sections.items():
+            f.write(f"- [{section}](#{anchors[section]}) ({len(items)})\n")
+        f.write(f"\n**Total: {total} items**\n\n")
+        f.write("---\n\n")
+
+        for section, items in sections.items():
+            f.write(f"## {section}\n\n")
+            f.write("".join(f"- [{item['name']}]({item['url']})\n" for item in items))
+            f.write("\n")
+
     print(f"[OK] Saved: {output_file.name} ({total} URLs)")
 
 
+def save_url_index(sections: dict, output_file: Path):
+    output_file.write_bytes(orjson.dumps(sections))
+    print(f"[OK] Saved: {output_file.name}")
+
+
+async def collect_urls(client: httpx.AsyncClient, browser) -> dict:
+    queue = asyncio.Queue()
+    for index, url in enumerate(APPS_SCRIPT_PAGES):
+        queue.put_nowait((index, url))
+
+    results = {}
+    workers = min(CONCURRENCY, len(APPS_SCRIPT_PAGES))
+    storage_state = load_storage_state()
+    states = await asyncio.gather(
+        *(crawl_worker(client, browser, storage_state, queue, results) for _ in range(workers))
+    )
+    save_storage_state(states)
+
+    sections = {}
+    for index in range(len(APPS_SCRIPT_PAGES)):
+        if index in results:
+            title, items = results[index]
+            sections[title] = items
+    return sections
+
+
 async def main():
     print("=" * 60)
     print("GOOGLE APPS SCRIPT - URL EXTRACTOR")
     print("=" * 60)
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    sections = {}
-
-    async with async_playwright() as p:
+    async with create_http_client() as client, async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-
-        for url in APPS_SCRIPT_PAGES:
-            try:
-                title, items = await extract_page_urls(page, url)
-                sections[title] = items
-                print(f"[OK] {title}: {len(items)} URLs")
-            except Exception as exc:
-                print(f"[FAIL] {url}: {exc}")
-
+        sections = await collect_urls(client, browser)
         await browser.close()
 
     generate_url_document(sections, OUTPUT_DIR / "apps_script_urls.md")
+    save_url_index(sections, OUTPUT_DIR / "apps_script_urls.json")
 
     print("\n" + "=" * 60)
     print("[OK] URL extraction complete!")
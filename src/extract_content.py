@@ -10,14 +10,29 @@ Key improvements:
 - Formats description, type, syntax, and parameters properly
 """
 
+import argparse
 import asyncio
 import re
-import copy
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from playwright.async_api import async_playwright
-from crawl4ai import AsyncWebCrawler, BrowserConfig
-from bs4 import BeautifulSoup, NavigableString
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CacheMode, CrawlerRunConfig
+import lxml.html
+import orjson
+from lxml import etree
+
+from extract_urls import (
+    RefItem,
+    block_static_assets,
+    fetch_cached,
+    find_reference_items,
+    load_reference_page_html,
+    read_cache,
+    stripped_text,
+    write_cache,
+)
+from xpath_helpers import has_class
 
 # Configuration
 ROOT = Path(__file__).resolve().parent.parent
@@ -26,6 +41,15 @@ OUTPUT_DIR = ROOT / "output"
 REFERENCE_URL = "https://www.tradingview.com/pine-script-reference/v6/"
 DOCS_URL = "https://www.tradingview.com/pine-script-docs/welcome/"
 
+# Docs pages crawled at once (all on one host, so kept low to avoid 429s)
+DOCS_CONCURRENCY = 5
+
+# Reference items sent to a worker process per task
+ITEM_BATCH_SIZE = 64
+
+# Persistent crawl4ai browser profile for the docs crawl
+DOCS_PROFILE_DIR = OUTPUT_DIR / ".crawl4ai_profile"
+
 # Section mappings for Reference
 REFERENCE_SECTIONS = {
     'an': 'Annotations',
@@ -55,27 +79,86 @@ DOCS_ORDER = [
     'Where Can I Get More Information'
 ]
 
+# Precompiled patterns (used once per item or per line)
+SEE_ALSO_RE = re.compile(r'see\s*also', re.I)
+TRIPLE_NL_RE = re.compile(r'\n\n\n+')
+MULTI_NL_RE = re.compile(r'\n{3,}')
+PREFIX_RE = re.compile(r'([a-z]+)_')
+MD_BULLET_RE = re.compile(r'- \[([^\]]+)\]\(([^\)]+)\)')
+MD_LINK_RE = re.compile(r'\[([^\]]+)\]\([^\)]+\)')
+BARE_URL_RE = re.compile(r'https?://[^\s\)]+')
+ON_THIS_PAGE_RE = re.compile(r'^.*[Oo]n this page.*$', re.MULTILINE)
+
+# Docs lines dropped by clean_docs_navigation: exact matches, and footer link substrings
+SKIP_LINES = frozenset({'Copied', 'Pine Script®', '!image', '![image]', '![]'})
+SKIP_SUBSTRINGS = (
+    'Pine Q&A chat', 'Stack Overflow', 'Telegram', 'Reddit',
+    'Discord', 'Facebook', 'Twitter', 'YouTube', 'LinkedIn',
+    '↗'  # External link indicator
+)
+
+# Opening lines that mark a backtick block as Pine code
+PINE_PREFIXES = ('//@', 'indicator', 'strategy', 'library')
+
+# Tags that get a space on each side when flattening text
+INLINE_TAGS = frozenset({'code', 'a', 'span', 'strong', 'em', 'b', 'i'})
+
+
+# Compiled once; libxml2 runs these walks in C
+HEADER_XPATH = etree.XPath('descendant::*[self::h3 or self::h2 or self::h1][1]')
+CONTENT_DIV_XPATH = etree.XPath(f"descendant::div[{has_class('tv-pine-reference-item__content')}][1]")
+SEE_ALSO_LINKS_XPATH = etree.XPath(f"descendant::div[{has_class('tv-pine-reference-item__see-also')}]")
+TEXT_DIV_XPATH = etree.XPath(f"descendant::div[{has_class('tv-pine-reference-item__text')}]")
+
+
+def classes_of(elem) -> list:
+    """Class tokens of an lxml element."""
+    return elem.get('class', '').split()
+
+
+def single_string(elem):
+    """Text of an element made of exactly one string, possibly through single-child wrappers."""
+    while True:
+        children = list(elem)
+        if not children:
+            return elem.text
+        if len(children) > 1 or elem.text or children[0].tail:
+            return None
+        elem = children[0]
+
 
 def get_text_with_spacing(elem) -> str:
     """
-    Extract text from element preserving spaces between inline elements.
+    Extract text from element preserving spaces between inline elements, whitespace-collapsed.
     This prevents text like 'the library()function' becoming 'thelibrary()function'.
     """
-    if isinstance(elem, NavigableString):
-        return str(elem)
+    # Common case, only inline markup below: a space between every string gives the same
+    # words, so let itertext collect them in one C-level walk instead of recursing
+    if elem.tag not in ('code', 'span'):
+        for node in elem.iterdescendants():
+            if not isinstance(node.tag, str):
+                continue  # comments
+            if node.tag not in INLINE_TAGS or node.getparent().tag in ('code', 'span'):
+                break
+        else:
+            return ' '.join(' '.join(elem.itertext()).split())
     
+    return ' '.join(_get_text_with_spacing(elem).split())
+
+
+def _get_text_with_spacing(elem) -> str:
+    """Recursive walk behind get_text_with_spacing, for elements with block-level children."""
     # For code elements, get text without extra spaces
-    if elem.name in ['code', 'span'] and elem.parent and elem.parent.name not in ['pre']:
-        return elem.get_text()
-    
-    result = ""
-    for child in elem.children:
-        if isinstance(child, NavigableString):
-            result += str(child)
-        elif hasattr(child, 'name'):
-            child_text = get_text_with_spacing(child)
+    parent = elem.getparent()
+    if elem.tag in ('code', 'span') and parent is not None and parent.tag != 'pre':
+        return ''.join(elem.itertext())
+    
+    result = elem.text or ''
+    for child in elem:
+        if isinstance(child.tag, str) and child.tag not in ('script', 'style'):
+            child_text = _get_text_with_spacing(child)
             # Add space before inline elements if needed
-            if child.name in ['code', 'a', 'span', 'strong', 'em', 'b', 'i']:
+            if child.tag in INLINE_TAGS:
                 if result and not result.endswith(' ') and not result.endswith('\n'):
                     result += ' '
                 result += child_text
@@ -83,6 +166,7 @@ def get_text_with_spacing(elem) -> str:
                     result += ' '
             else:
                 result += child_text
+        result += child.tail or ''
     
     return result
 
@@ -92,130 +176,131 @@ def extract_code_block_text(elem) -> str:
     Extract text from a code/pre element preserving line breaks.
     Converts <br/> tags to actual newlines and iterates through spans.
     """
-    code_text = ""
-    
     # Find the innermost code element if exists
-    inner = elem.find('code') if elem.name == 'pre' else elem
-    if not inner:
+    inner = next(elem.iterdescendants('code'), None) if elem.tag == 'pre' else elem
+    if inner is None:
         inner = elem
     
-    for child in inner.children:
-        if isinstance(child, str):
-            code_text += str(child)
-        elif hasattr(child, 'name'):
-            if child.name == 'br':
-                code_text += '\n'
-            elif child.name == 'span':
-                # Recursively get text from span
-                code_text += extract_code_block_text(child)
-            else:
-                code_text += child.get_text()
+    code_text = inner.text or ''
+    for child in inner:
+        if child.tag == 'br':
+            code_text += '\n'
+        elif child.tag == 'span':
+            # Recursively get text from span
+            code_text += extract_code_block_text(child)
+        elif isinstance(child.tag, str):
+            code_text += ''.join(child.itertext())
+        code_text += child.tail or ''
     
     return code_text
 
 
+def format_sub_header(elem):
+    """Sub-headers (Type, Syntax, Arguments, Example, Remarks, etc.); None at 'See also'."""
+    section_text = stripped_text(elem)
+    if section_text.lower() == 'see also':
+        return None
+    return f"\n**{section_text}**"
+
+
+def format_code_block(elem) -> str:
+    """Code examples as fenced pine blocks."""
+    code_text = extract_code_block_text(elem).strip()
+    return f"\n```pine\n{code_text}\n```\n" if code_text else ''
+
+
+# Block class -> formatter, in dispatch priority order (main text, arguments list);
+# <pre> blocks without one of these classes are code
+BLOCK_HANDLERS = {
+    'tv-pine-reference-item__sub-header': format_sub_header,
+    'tv-pine-reference-item__text': get_text_with_spacing,
+    'tv-pine-reference-item__code': format_code_block,
+    'tv-pine-reference-item__text-group': get_text_with_spacing,
+}
+
+
+def iter_blocks(content_div):
+    """
+    Yield (block, formatter) pairs in document order.
+    Lazy on top of lxml's C iterator, so breaking out of the loop stops the walk.
+    """
+    for elem in content_div.iterdescendants('div', 'pre', 'code'):
+        classes = classes_of(elem)
+        handler = next((BLOCK_HANDLERS[cls] for cls in BLOCK_HANDLERS if cls in classes), None)
+        if handler is None and elem.tag == 'pre':
+            handler = format_code_block
+        if handler is not None:
+            yield elem, handler
+
+
 def extract_item_content(item_div) -> dict:
     """
-    Extract content from item div with proper structure handling.
-    Navigates the nested HTML structure correctly.
+    Extract content from an lxml item div with proper structure handling.
+    Navigates the nested HTML structure correctly. The see-also section, scripts
+    and styles are dropped from the element, so pass a freshly parsed item.
     """
     try:
         item_id = item_div.get('id', 'unknown')
         
         # Get header/name
-        header = item_div.find(['h3', 'h2', 'h1'])
-        item_name = header.get_text(strip=True) if header else item_id
-        
-        # Clone for safe manipulation
-        working_div = copy.deepcopy(item_div)
+        headers = HEADER_XPATH(item_div)
+        item_name = stripped_text(headers[0]) if headers else item_id
         
         # Remove scripts and styles
-        for el in working_div(['script', 'style']):
-            el.decompose()
+        for el in list(item_div.iterdescendants('script', 'style')):
+            el.drop_tree()
         
         # Find content wrapper
-        content_div = working_div.find('div', {'class': 'tv-pine-reference-item__content'})
-        if not content_div:
-            content_div = working_div
+        content_divs = CONTENT_DIV_XPATH(item_div)
+        content_div = content_divs[0] if content_divs else item_div
         
         # Remove "SEE ALSO" section
-        see_also = content_div.find('div', {'class': 'tv-pine-reference-item__sub-header'}, 
-                                     string=re.compile(r'see\s*also', re.I))
-        if see_also:
+        see_also = next(
+            (
+                div for div in content_div.iterdescendants('div')
+                if 'tv-pine-reference-item__sub-header' in classes_of(div)
+                and SEE_ALSO_RE.search(single_string(div) or '')
+            ),
+            None
+        )
+        if see_also is not None:
             # Remove see_also and its next siblings
-            for sibling in list(see_also.find_next_siblings()):
-                try:
-                    sibling.decompose()
-                except:
-                    pass
-            try:
-                see_also.decompose()
-            except:
-                pass
-        
-        # Also try text matching
-        for tag in content_div.find_all():
-            if (tag.get_text(strip=True) or '').lower() == 'see also':
-                try:
-                    tag.decompose()
-                except:
-                    pass
-                break
+            for sibling in list(see_also.itersiblings(etree.Element)):
+                sibling.drop_tree()
+            see_also.drop_tree()
+        else:
+            # Also try text matching
+            for tag in content_div.iterdescendants(etree.Element):
+                if stripped_text(tag).lower() == 'see also':
+                    tag.drop_tree()
+                    break
         
         # Remove see-also links
-        for see_also_links in content_div.find_all('div', {'class': 'tv-pine-reference-item__see-also'}):
-            try:
-                see_also_links.decompose()
-            except:
-                pass
+        for see_also_links in SEE_ALSO_LINKS_XPATH(content_div):
+            see_also_links.drop_tree()
         
         # Build content from structure
         content_parts = []
-        current_section = None
         
-        for elem in content_div.find_all(['div', 'pre', 'code'], recursive=True):
-            classes = elem.get('class', [])
-            
-            # Sub-headers (Type, Syntax, Arguments, Example, Remarks, etc.)
-            if 'tv-pine-reference-item__sub-header' in classes:
-                section_text = elem.get_text(strip=True)
-                if section_text.lower() == 'see also':
-                    break  # Stop at see also
-                current_section = section_text
-                content_parts.append(f"\n**{section_text}**")
-            
-            # Main text content
-            elif 'tv-pine-reference-item__text' in classes:
-                text = get_text_with_spacing(elem).strip()
-                # Clean excessive whitespace
-                text = re.sub(r'\s+', ' ', text)
-                if text:
-                    content_parts.append(text)
-            
-            # Code examples
-            elif elem.name == 'pre' or 'tv-pine-reference-item__code' in classes:
-                code_text = extract_code_block_text(elem)
-                if code_text.strip():
-                    content_parts.append(f"\n```pine\n{code_text.strip()}\n```\n")
-            
-            # Arguments list
-            elif 'tv-pine-reference-item__text-group' in classes:
-                text = get_text_with_spacing(elem).strip()
-                if text:
-                    content_parts.append(text)
+        for elem, handler in iter_blocks(content_div):
+            part = handler(elem)
+            if part is None:
+                break  # Stop at see also
+            if part:
+                content_parts.append(part)
         
         # If we got no content from structured extraction, fall back
         if not content_parts or sum(len(p) for p in content_parts) < 20:
             # Try getting all text divs
-            for text_div in content_div.find_all('div', {'class': 'tv-pine-reference-item__text'}):
-                text = get_text_with_spacing(text_div).strip()
+            for text_div in TEXT_DIV_XPATH(content_div):
+                text = get_text_with_spacing(text_div)
                 if text:
                     content_parts.append(text)
             
             # Still nothing? Get all text
             if not content_parts:
-                content = content_div.get_text(separator='\n', strip=True)
-                content = re.sub(r'\n\n\n+', '\n\n', content)
+                content = '\n'.join(text.strip() for text in content_div.itertext() if text.strip())
+                content = TRIPLE_NL_RE.sub('\n\n', content)
                 return {
                     'id': item_id,
                     'name': item_name,
@@ -224,7 +309,7 @@ def extract_item_content(item_div) -> dict:
                 }
         
         content = '\n'.join(content_parts)
-        content = re.sub(r'\n\n\n+', '\n\n', content)
+        content = TRIPLE_NL_RE.sub('\n\n', content)
         content = content.replace('\xa0', ' ')
         content = content.strip()
         
@@ -241,42 +326,88 @@ def extract_item_content(item_div) -> dict:
         }
 
 
-async def extract_reference_content():
-    """Extract all content from Pine Script Reference using Playwright."""
+def extract_item_worker(item: tuple) -> dict:
+    """
+    Process pool entry point: extract one reference item from its serialized HTML.
+    Takes an (item_id, html) pair so it pickles cheaply.
+    """
+    item_id, html = item
+    try:
+        item_div = lxml.html.fromstring(html)
+    except etree.ParserError as e:
+        return {'id': item_id, 'error': str(e)[:100]}
+    return extract_item_content(item_div)
+
+
+def extract_item_batch(items: list) -> list:
+    """Process pool entry point for a batch of (item_id, html) pairs."""
+    return [extract_item_worker(item) for item in items]
+
+
+async def load_reference_html(browser) -> str:
+    """Load the Reference page in a new page of `browser` and return its rendered HTML."""
+    page = await browser.new_page()
+    await page.route("**/*", block_static_assets)
+    try:
+        return await load_reference_page_html(page)
+    finally:
+        await page.close()
+
+
+async def fetch_reference_html(browser, use_cache: bool = True) -> str:
+    """Reference page HTML from output/cache when fresh, otherwise loaded with `browser`."""
+    return await fetch_cached(REFERENCE_URL, lambda: load_reference_html(browser), use_cache=use_cache)
+
+
+async def extract_reference_content(browser=None, precomputed_html=None, use_cache: bool = True):
+    """
+    Extract all content from Pine Script Reference using Playwright (reusing `browser` if given).
+    With `precomputed_html` (the page already loaded by extract_urls) no page is loaded at all.
+    """
     print("\n[Reference] Extracting content with Playwright...")
     
     sections = {}
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        try:
-            await page.goto(REFERENCE_URL, wait_until='networkidle', timeout=90000)
-            await asyncio.sleep(5)
-            html = await page.content()
-        except Exception as e:
-            print(f"[Reference] Error: {e}")
-            await browser.close()
-            return {}
-        
-        await browser.close()
-    
     try:
-        soup = BeautifulSoup(html, 'lxml')
-    except:
-        soup = BeautifulSoup(html, 'html.parser')
+        if precomputed_html:
+            html = precomputed_html
+        elif browser is not None:
+            html = await fetch_reference_html(browser, use_cache)
+        elif use_cache and (cached := read_cache(REFERENCE_URL)) is not None:
+            html = cached  # No need to start a browser at all
+        else:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=True)
+                try:
+                    html = await fetch_reference_html(browser, use_cache=False)
+                finally:
+                    await browser.close()
+    except Exception as e:
+        print(f"[Reference] Error: {e}")
+        return {}
     
-    items = soup.find_all('div', {'class': 'tv-pine-reference-item'})
+    items = find_reference_items(html)
     print(f"[Reference] Found {len(items)} items in page")
     
-    for item in items:
-        item_id = item.get('id', '')
-        if not item_id:
-            continue
-        
+    # Serialize each item once; workers re-parse their own item so nothing heavy is pickled
+    item_htmls = [
+        (item_id, lxml.html.tostring(item, encoding='unicode', with_tail=False))
+        for item in items if (item_id := item.get('id', ''))
+    ]
+    
+    # Items are independent and extraction is CPU-bound, so fan out across cores
+    # Batches of ITEM_BATCH_SIZE amortize pickling; awaiting them keeps the event loop free
+    loop = asyncio.get_running_loop()
+    batches = [item_htmls[i:i + ITEM_BATCH_SIZE] for i in range(0, len(item_htmls), ITEM_BATCH_SIZE)]
+    with ProcessPoolExecutor() as executor:
+        batch_results = await asyncio.gather(
+            *(loop.run_in_executor(executor, extract_item_batch, batch) for batch in batches)
+        )
+    results = [extracted for batch in batch_results for extracted in batch]
+    
+    for (item_id, _), extracted in zip(item_htmls, results):
         # Get section from prefix
-        match = re.match(r'([a-z]+)_', item_id)
+        match = PREFIX_RE.match(item_id)
         if match:
             prefix = match.group(1)
             section_name = REFERENCE_SECTIONS.get(prefix, prefix.upper())
@@ -286,95 +417,136 @@ async def extract_reference_content():
         if section_name not in sections:
             sections[section_name] = []
         
-        # Extract with proper handling
-        extracted = extract_item_content(item)
-        
         if 'error' not in extracted:
-            sections[section_name].append({
-                'id': item_id,
-                'name': extracted['name'],
-                'content': extracted['content'],
-                'url': f"{REFERENCE_URL}#{item_id}"
-            })
+            sections[section_name].append(RefItem(
+                name=extracted['name'],
+                url=f"{REFERENCE_URL}#{item_id}",
+                id=item_id,
+                content=extracted['content']
+            ))
     
     total = sum(len(v) for v in sections.values())
     print(f"[Reference] Extracted {total} items in {len(sections)} sections")
     return sections
 
 
-async def extract_docs_content():
-    """Extract all content from Pine Script Docs using crawl4ai."""
-    print("\n[Docs] Extracting content with crawl4ai...")
+def load_docs_urls():
+    """
+    Flat list of {name, url, section} docs pages to crawl, or None if there is no index.
+    Reads docs_urls.json (written by extract_urls.py), falling back to the docs_urls.md
+    index when the JSON has not been generated yet (e.g. the markdown shipped in output/).
+    """
+    json_file = OUTPUT_DIR / "docs_urls.json"
+    if json_file.exists():
+        # Flatten the {section: [{name, url}]} index
+        return [
+            {'name': item['name'], 'url': item['url'], 'section': section}
+            for section, items in orjson.loads(json_file.read_bytes()).items()
+            for item in items
+        ]
     
-    urls_file = OUTPUT_DIR / "docs_urls.md"
-    if not urls_file.exists():
-        print("[Docs] Error: docs_urls.md not found. Run extract_urls.py first.")
-        return {}
+    md_file = OUTPUT_DIR / "docs_urls.md"
+    if not md_file.exists():
+        return None
     
     # Parse URLs from markdown file
     urls_to_crawl = []
     current_section = "General"
-    
-    file_content = urls_file.read_text(encoding='utf-8')
-    for line in file_content.split('\n'):
+    for line in md_file.read_text(encoding='utf-8').split('\n'):
         if line.startswith('## ') and not line.startswith('## Table'):
             current_section = line[3:].strip()
         elif line.startswith('- ['):
-            match = re.match(r'- \[([^\]]+)\]\(([^\)]+)\)', line)
-            if match:
-                name = match.group(1)
-                url = match.group(2)
-                if url.startswith('http'):
-                    urls_to_crawl.append({
-                        'name': name,
-                        'url': url,
-                        'section': current_section
-                    })
+            match = MD_BULLET_RE.match(line)
+            if match and match.group(2).startswith('http'):
+                urls_to_crawl.append({
+                    'name': match.group(1),
+                    'url': match.group(2),
+                    'section': current_section
+                })
+    return urls_to_crawl
+
+
+async def extract_docs_content(use_cache: bool = True):
+    """Extract all content from Pine Script Docs using crawl4ai (pages cached under output/cache)."""
+    print("\n[Docs] Extracting content with crawl4ai...")
+    
+    urls_to_crawl = load_docs_urls()
+    if urls_to_crawl is None:
+        print("[Docs] Error: docs_urls.json / docs_urls.md not found. Run extract_urls.py first.")
+        return {}
     
     print(f"[Docs] Found {len(urls_to_crawl)} URLs to crawl")
     
     browser_config = BrowserConfig(
         headless=True,
+        text_mode=True,  # Skip images; only the markdown text is used
+        # Keep one browser profile across pages and runs (cookies, consent, HTTP cache)
+        use_persistent_context=True,
+        user_data_dir=str(DOCS_PROFILE_DIR),
         extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"]
     )
     
-    sections = {}
+    # Single host: crawl4ai's batch API keeps a small number of pages in flight,
+    # each paced by a short random delay. output/cache is the only page cache;
+    # crawl4ai's own never expires and would hand back stale pages after CACHE_TTL
+    run_config = CrawlerRunConfig(
+        cache_mode=CacheMode.BYPASS,
+        page_timeout=60000,
+        semaphore_count=DOCS_CONCURRENCY,
+        mean_delay=0.5,
+        max_range=0.5
+    )
     
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        for i, item in enumerate(urls_to_crawl):
-            try:
-                print(f"  [{i+1}/{len(urls_to_crawl)}] {item['name'][:35]}...", end=" ", flush=True)
-                
-                result = await crawler.arun(url=item['url'])
-                
-                if result.success:
-                    # Use crawl4ai's markdown conversion
-                    if isinstance(result.markdown, str):
-                        page_content = result.markdown
-                    else:
-                        page_content = result.markdown.raw_markdown if result.markdown else ""
-                    
-                    # Clean navigation
-                    page_content = clean_docs_navigation(page_content)
-                    
-                    section = item['section']
-                    if section not in sections:
-                        sections[section] = []
-                    
-                    sections[section].append({
-                        'name': item['name'],
-                        'url': item['url'],
-                        'content': page_content
-                    })
-                    
-                    print("[OK]")
-                else:
-                    print(f"[FAIL]")
-                    
-            except Exception as e:
-                print(f"[FAIL] {str(e)[:30]}")
-            
-            await asyncio.sleep(0.5)
+    # A page listed under several sections is crawled once
+    unique_items = {}
+    for item in urls_to_crawl:
+        unique_items.setdefault(item['url'], item)
+    
+    # Raw markdown per URL: fresh entries from output/cache, the rest crawled
+    markdowns = {}
+    if use_cache:
+        for url in unique_items:
+            cached = read_cache(url, '.md')
+            if cached is not None:
+                markdowns[url] = cached
+    to_crawl = [url for url in unique_items if url not in markdowns]
+    if markdowns:
+        print(f"[Docs] {len(markdowns)} pages from cache, {len(to_crawl)} to crawl")
+    
+    if to_crawl:
+        async with AsyncWebCrawler(config=browser_config) as crawler:
+            crawled = await crawler.arun_many(urls=to_crawl, config=run_config)
+        
+        for result in crawled:
+            if not result.success:
+                continue
+            # Use crawl4ai's markdown conversion
+            if isinstance(result.markdown, str):
+                markdown = result.markdown
+            else:
+                markdown = result.markdown.raw_markdown if result.markdown else ""
+            markdowns[result.url] = markdown
+            write_cache(result.url, markdown, '.md')
+    
+    # Batch results come back in completion order; report them in index order
+    for i, (url, item) in enumerate(unique_items.items()):
+        status = "[OK]" if url in markdowns else "[FAIL]"
+        print(f"  [{i+1}/{len(unique_items)}] {item['name'][:35]}... {status}")
+    
+    # Collect in crawl order so sections keep the navigation order
+    sections = {}
+    for item in urls_to_crawl:
+        if item['url'] not in markdowns:
+            continue
+        
+        # Clean navigation
+        page_content = clean_docs_navigation(markdowns[item['url']])
+        
+        section = item['section']
+        if section not in sections:
+            sections[section] = []
+        
+        sections[section].append(RefItem(name=item['name'], url=item['url'], content=page_content))
     
     total = sum(len(v) for v in sections.values())
     print(f"[Docs] Extracted {total} pages in {len(sections)} sections")
@@ -387,35 +559,33 @@ def clean_docs_navigation(content: str) -> str:
     Strips markdown links, keeping only link text.
     Completely removes 'On this page' sidebar sections.
     """
-    import re
-    
     # Remove markdown links but keep text: [text](url) -> text
-    content = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', content)
+    content = MD_LINK_RE.sub(r'\1', content)
     
     # Remove bare URLs
-    content = re.sub(r'https?://[^\s\)]+', '', content)
+    content = BARE_URL_RE.sub('', content)
     
     # Remove any line containing "On this page" (case insensitive)
-    content = re.sub(r'^.*[Oo]n this page.*$', '', content, flags=re.MULTILINE)
+    content = ON_THIS_PAGE_RE.sub('', content)
     
-    lines = content.split('\n')
+    # Single pass: navigation/footer filtering and code block repair share one line loop.
+    # The markdown has code blocks like:
+    # `code line 1
+    # code line 2
+    # `
+    # which are converted to:
+    # ```pine
+    # code line 1
+    # code line 2
+    # ```
     cleaned = []
     started_content = False
-    in_sidebar_nav = False
+    in_code_block = False
     
-    for line in lines:
+    for line in content.split('\n'):
         stripped = line.strip()
         
-        # Skip empty lines at start
-        if not started_content and not stripped:
-            continue
-        
-        # Skip short bullet points before content (navigation menu)
-        if stripped.startswith('* ') and len(stripped) < 60:
-            if not started_content:
-                continue
-        
-        # Start content at first heading
+        # Start content at first heading (skips leading blank lines and the navigation menu)
         if not started_content:
             if line.startswith('# '):
                 started_content = True
@@ -427,127 +597,89 @@ def clean_docs_navigation(content: str) -> str:
             break
         
         # Skip Previous/Next navigation links
-        if stripped.startswith('Previous') or stripped.startswith('Next'):
-            continue
-        
-        # Skip "Copied" markers (from code copy buttons)
-        if stripped == 'Copied':
+        if stripped.startswith(('Previous', 'Next')):
             continue
         
-        # Skip "Pine Script®" standalone lines (code block markers)
-        if stripped == 'Pine Script®':
+        # Skip copy-button markers, standalone "Pine Script®" labels and empty image markers
+        if stripped in SKIP_LINES:
             continue
         
         # Skip external community links (footer elements)
-        skip_patterns = [
-            'Pine Q&A chat', 'Stack Overflow', 'Telegram', 'Reddit',
-            'Discord', 'Facebook', 'Twitter', 'YouTube', 'LinkedIn',
-            '↗'  # External link indicator
-        ]
-        if any(pattern in stripped for pattern in skip_patterns):
+        if any(pattern in stripped for pattern in SKIP_SUBSTRINGS):
             continue
         
-        # Skip empty image markers (!image without path/alt text)
-        if stripped == '!image' or stripped == '![image]' or stripped == '![]':
-            continue
-        
-        cleaned.append(line)
-    
-    result = '\n'.join(cleaned)
-    
-    # Fix code blocks: The markdown has patterns like:
-    # `code line 1
-    # code line 2
-    # `
-    # We need to convert to:
-    # ```pine
-    # code line 1
-    # code line 2
-    # ```
-    
-    lines = result.split('\n')
-    fixed_lines = []
-    in_code_block = False
-    code_buffer = []
-    
-    for line in lines:
-        stripped = line.strip()
-        
         # Check for line starting with backtick (start of code block)
         if stripped.startswith('`') and not stripped.startswith('```') and not in_code_block:
             # Check if this looks like Pine code
             content_after = stripped[1:]  # Remove the backtick
-            if content_after.startswith('//@') or content_after.startswith('indicator') or content_after.startswith('strategy') or content_after.startswith('library'):
+            if content_after.startswith(PINE_PREFIXES):
                 in_code_block = True
-                fixed_lines.append('```pine')
-                fixed_lines.append(content_after)  # Add code without backtick
+                cleaned.append('```pine')
+                cleaned.append(content_after)  # Add code without backtick
                 continue
         
         # Check for line ending with backtick (end of code block)
         if in_code_block and stripped == '`':
             in_code_block = False
-            fixed_lines.append('```')
+            cleaned.append('```')
             continue
         
         if in_code_block and stripped.endswith('`') and not stripped.endswith('```'):
             # End of code block with content
             in_code_block = False
-            fixed_lines.append(stripped[:-1])  # Remove trailing backtick
-            fixed_lines.append('```')
+            cleaned.append(stripped[:-1])  # Remove trailing backtick
+            cleaned.append('```')
             continue
         
-        fixed_lines.append(line)
+        cleaned.append(line)
     
-    result = '\n'.join(fixed_lines)
+    result = '\n'.join(cleaned)
     
     # Clean up excessive whitespace
-    result = re.sub(r'\n{3,}', '\n\n', result)
+    result = MULTI_NL_RE.sub('\n\n', result)
     
     return result.strip()
 
 
 def generate_content_document(sections: dict, source_name: str, output_file: Path):
-    """Generate markdown document with content and index."""
-    
-    doc = f"# {source_name} - Complete Content\n\n"
-    doc += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-    
-    # Table of contents
-    doc += "## Table of Contents\n\n"
-    total = 0
-    for section in sections.keys():  # Preserve original order
-        items = sections[section]
-        count = len(items)
-        total += count
-        section_anchor = section.lower().replace(' ', '-')
-        doc += f"- [{section}](#{section_anchor}) ({count})\n"
-    
-    doc += f"\n**Total: {total} items**\n\n"
-    doc += "---\n\n"
-    
-    # Content sections
-    for section in sections.keys():  # Preserve original order
-        items = sections[section]
-        doc += f"## {section}\n\n"
-        
-        for item in items:  # Preserve original order
-            name = item.get('name', item.get('id', 'Unknown'))
-            content = item.get('content', '')
+    """Generate markdown document with content and index, streamed to disk."""
+    
+    # Table of contents (preserve original order)
+    toc = [(section, section.lower().replace(' ', '-'), len(items)) for section, items in sections.items()]
+    total = sum(count for _, _, count in toc)
+    
+    header = [
+        f"# {source_name} - Complete Content\n\n",
+        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n",
+        "## Table of Contents\n\n",
+    ]
+    for section, section_anchor, count in toc:
+        header.append(f"- [{section}](#{section_anchor}) ({count})\n")
+    header.append(f"\n**Total: {total} items**\n\n")
+    header.append("---\n\n")
+    
+    # Every chunk is a whole line group, so normalizing FAQ capitalization per write
+    # gives the same result as on the full document
+    with output_file.open('w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write(''.join(header).replace('Faq', 'FAQ'))
+        
+        # Content sections
+        for section, items in sections.items():  # Preserve original order
+            f.write(f"## {section}\n\n".replace('Faq', 'FAQ'))
             
-            doc += f"### {name}\n\n"
-            doc += content + "\n\n"
-            doc += "---\n\n"
-    
-    # Final cleanup: normalize FAQ capitalization
-    doc = doc.replace('Faq', 'FAQ')
+            for item in items:  # Preserve original order
+                f.write(f"### {item.name}\n\n{item.content}\n\n---\n\n".replace('Faq', 'FAQ'))
     
-    output_file.write_text(doc, encoding='utf-8')
     size_mb = output_file.stat().st_size / (1024 * 1024)
     print(f"[OK] Saved: {output_file.name} ({total} items, {size_mb:.2f} MB)")
 
 
-async def main():
-    """Main execution."""
+async def main(browser=None, reference_html=None, use_cache: bool = True):
+    """
+    Main execution. Reuses `browser` for the Reference page when given, or the page HTML
+    itself when `reference_html` is passed (see run_all.py).
+    use_cache=False refetches pages even if output/cache has a fresh copy.
+    """
     print("="*60)
     print("PINE SCRIPT V6 - CONTENT EXTRACTOR v3")
     print("="*60)
@@ -555,7 +687,7 @@ async def main():
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
     # Extract Reference content
-    reference_sections = await extract_reference_content()
+    reference_sections = await extract_reference_content(browser, precomputed_html=reference_html, use_cache=use_cache)
     if reference_sections:
         generate_content_document(
             reference_sections,
@@ -564,7 +696,7 @@ async def main():
         )
     
     # Extract Docs content
-    docs_sections = await extract_docs_content()
+    docs_sections = await extract_docs_content(use_cache)
     if docs_sections:
         generate_content_document(
             docs_sections,
@@ -578,4 +710,6 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Extract Pine Script v6 Reference and Docs content.")
+    parser.add_argument("--no-cache", action="store_true", help="refetch pages instead of reading output/cache")
+    asyncio.run(main(use_cache=not parser.parse_args().no_cache))
@@ -8,12 +8,21 @@ Sources:
 - Docs: tradingview.com/pine-script-docs
 """
 
+import argparse
 import asyncio
+import gzip
+import hashlib
 import re
+import time
+import zlib
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, FeatureNotFound
+import lxml.html
+import orjson
+from lxml.cssselect import CSSSelector
 
 # Configuration
 ROOT = Path(__file__).resolve().parent.parent
@@ -51,22 +60,147 @@ DOCS_ORDER = [
     'Where Can I Get More Information'
 ]
 
+# Elements whose presence means the page content has rendered
+REFERENCE_ITEM_SELECTOR = 'div.tv-pine-reference-item'
+DOCS_LINK_SELECTOR = 'a[href*="/pine-script-docs/"]'
 
-async def extract_reference_urls(page):
-    """Extract all URLs from Pine Script Reference page."""
+# On-disk cache of fetched pages (gzip, keyed by URL hash) so reruns skip the network
+CACHE_DIR = OUTPUT_DIR / "cache"
+CACHE_TTL = 3600  # seconds
+
+# Reference items and their headers, compiled once (cssselect translates to XPath)
+REFERENCE_ITEMS_CSS = CSSSelector('div.tv-pine-reference-item')
+ITEM_HEADER_CSS = CSSSelector('h1, h2, h3')
+
+# Item id prefix, e.g. 'fun_' in 'fun_ta.sma'
+PREFIX_RE = re.compile(r'([a-z]+)_')
+
+# Resource types aborted in Playwright: the extractors only read the DOM text
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media', 'stylesheet', 'other'})
+
+
+@dataclass(slots=True)
+class RefItem:
+    """One Reference item or Docs page in the `sections` dicts (slots: no per-item __dict__)."""
+    name: str
+    url: str
+    id: str = ""
+    content: str = ""
+
+
+def make_soup(html: str) -> BeautifulSoup:
+    """Parse HTML with lxml (C tokenizer), falling back to html.parser if it is not installed."""
+    try:
+        return BeautifulSoup(html, 'lxml')
+    except FeatureNotFound:
+        return BeautifulSoup(html, 'html.parser')
+
+
+def stripped_text(elem) -> str:
+    """Concatenated text with every piece stripped (BeautifulSoup's get_text(strip=True))."""
+    return ''.join(text.strip() for text in elem.itertext())
+
+
+def find_reference_items(html: str) -> list:
+    """Parse the Reference page with lxml and return its item divs in page order."""
+    return REFERENCE_ITEMS_CSS(lxml.html.fromstring(html))
+
+
+def cache_path(url: str, suffix: str) -> Path:
+    """Cache file for a URL, e.g. output/cache/<sha1>.html.gz."""
+    return CACHE_DIR / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}{suffix}.gz"
+
+
+def read_cache(url: str, suffix: str = '.html', ttl: int = CACHE_TTL):
+    """Return the cached text for a URL, or None if it is missing or older than ttl seconds."""
+    path = cache_path(url, suffix)
+    try:
+        if path.stat().st_mtime < time.time() - ttl:
+            return None
+        return gzip.decompress(path.read_bytes()).decode('utf-8')
+    except (OSError, EOFError, UnicodeDecodeError, zlib.error):
+        return None
+
+
+def write_cache(url: str, text: str, suffix: str = '.html'):
+    """Store text for a URL (written to a temp file first, so readers never see a partial entry)."""
+    path = cache_path(url, suffix)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(gzip.compress(text.encode('utf-8')))
+    tmp_path.replace(path)
+
+
+async def fetch_cached(url: str, fetch, suffix: str = '.html', use_cache: bool = True, ttl: int = CACHE_TTL) -> str:
+    """
+    Return the cached text for url if fresh, otherwise await fetch() and cache its result.
+    With use_cache=False the cache is not read, but the fresh result still refreshes it.
+    """
+    if use_cache:
+        text = read_cache(url, suffix, ttl)
+        if text is not None:
+            return text
+    text = await fetch()
+    write_cache(url, text, suffix)
+    return text
+
+
+async def block_static_assets(route):
+    """Abort requests for images, fonts, media and stylesheets; let everything else through."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def load_page_html(page, url: str, selector: str) -> str:
+    """Navigate to url and return the HTML once `selector` is attached."""
+    await page.goto(url, wait_until='domcontentloaded', timeout=90000)
+    await page.wait_for_selector(selector, state='attached', timeout=30000)
+    return await page.content()
+
+
+async def wait_for_stable_count(page, selector: str, interval: float = 1.0, timeout: float = 30.0):
+    """Wait until the number of elements matching `selector` stops changing (at most `timeout` seconds)."""
+    deadline = time.monotonic() + timeout
+    count = -1
+    while time.monotonic() < deadline:
+        current = await page.locator(selector).count()
+        if current == count:
+            return
+        count = current
+        await asyncio.sleep(interval)
+
+
+async def load_reference_page_html(page) -> str:
+    """
+    Load the Reference page and return its HTML once every item is rendered.
+    The URL and content steps share this HTML through output/cache, so both wait the same way.
+    """
+    await page.goto(REFERENCE_URL, wait_until='networkidle', timeout=90000)
+    await page.wait_for_selector(REFERENCE_ITEM_SELECTOR, state='attached', timeout=30000)
+    await wait_for_stable_count(page, REFERENCE_ITEM_SELECTOR)
+    return await page.content()
+
+
+async def extract_reference_urls(page, use_cache: bool = True):
+    """
+    Extract all URLs from Pine Script Reference page.
+    Returns (sections, html); the HTML lets extract_content skip loading the page again.
+    """
     print("\n[Reference] Extracting URLs...")
     
     try:
-        await page.goto(REFERENCE_URL, wait_until='domcontentloaded', timeout=90000)
-        await asyncio.sleep(5)
-        
-        html = await page.content()
+        html = await fetch_cached(
+            REFERENCE_URL,
+            lambda: load_reference_page_html(page),
+            use_cache=use_cache
+        )
     except Exception as e:
         print(f"[Reference] Error loading page: {e}")
-        return {}
+        return {}, None
     
-    soup = BeautifulSoup(html, 'html.parser')
-    items = soup.find_all('div', {'class': 'tv-pine-reference-item'})
+    items = find_reference_items(html)
     
     sections = {}
     for item in items:
@@ -75,7 +209,7 @@ async def extract_reference_urls(page):
             continue
         
         # Get section from prefix
-        match = re.match(r'([a-z]+)_', item_id)
+        match = PREFIX_RE.match(item_id)
         if match:
             prefix = match.group(1)
             section_name = REFERENCE_SECTIONS.get(prefix, prefix.upper())
@@ -88,36 +222,34 @@ async def extract_reference_urls(page):
         url = f"{REFERENCE_URL}#{item_id}"
         
         # Get item name
-        header = item.find(['h2', 'h3', 'h1'])
-        name = header.get_text(strip=True) if header else item_id
+        headers = ITEM_HEADER_CSS(item)
+        name = stripped_text(headers[0]) if headers else item_id
         
-        sections[section_name].append({
-            'id': item_id,
-            'name': name,
-            'url': url
-        })
+        sections[section_name].append(RefItem(name=name, url=url, id=item_id))
     
     print(f"[Reference] Found {sum(len(v) for v in sections.values())} items in {len(sections)} sections")
-    return sections
+    return sections, html
 
 
-async def extract_docs_urls(page):
+async def extract_docs_urls(page, use_cache: bool = True):
     """Extract all URLs from Pine Script Docs."""
     print("\n[Docs] Extracting URLs...")
     
     try:
-        await page.goto(DOCS_URL, wait_until='domcontentloaded', timeout=90000)
-        await asyncio.sleep(5)
-        
-        html = await page.content()
+        html = await fetch_cached(
+            DOCS_URL,
+            lambda: load_page_html(page, DOCS_URL, DOCS_LINK_SELECTOR),
+            use_cache=use_cache
+        )
     except Exception as e:
         print(f"[Docs] Error loading page: {e}")
         return {}
     
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = make_soup(html)
     
     # Find all links on the page
     sections = {}
+    seen_urls = {}  # section -> URLs already listed, for O(1) duplicate checks
     
     for link in soup.find_all('a', href=True):
         href = link.get('href', '')
@@ -155,11 +287,10 @@ async def extract_docs_urls(page):
             sections[section] = []
         
         # Avoid duplicates
-        if not any(item['url'] == url for item in sections[section]):
-            sections[section].append({
-                'name': text,
-                'url': url
-            })
+        seen = seen_urls.setdefault(section, set())
+        if url not in seen:
+            seen.add(url)
+            sections[section].append(RefItem(name=text, url=url))
     
     print(f"[Docs] Found {sum(len(v) for v in sections.values())} items in {len(sections)} sections")
     return sections
@@ -168,39 +299,78 @@ async def extract_docs_urls(page):
 def generate_url_document(sections: dict, source_name: str, output_file: Path):
     """Generate markdown document with URL index."""
     
-    doc = f"# {source_name} - URL Index\n\n"
-    doc += f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
+    parts = [
+        f"# {source_name} - URL Index\n\n",
+        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n",
+    ]
     
     # Table of contents
-    doc += "## Table of Contents\n\n"
-    total = 0
-    for section in sections.keys():
-        count = len(sections[section])
-        total += count
-        anchor = section.lower().replace(' ', '-')
-        doc += f"- [{section}](#{anchor}) ({count})\n"
+    toc = [(section, section.lower().replace(' ', '-'), len(items)) for section, items in sections.items()]
+    total = sum(count for _, _, count in toc)
+    parts.append("## Table of Contents\n\n")
+    for section, anchor, count in toc:
+        parts.append(f"- [{section}](#{anchor}) ({count})\n")
     
-    doc += f"\n**Total: {total} items**\n\n"
-    doc += "---\n\n"
+    parts.append(f"\n**Total: {total} items**\n\n")
+    parts.append("---\n\n")
     
     # Sections with URLs
-    for section in sections.keys():
-        items = sections[section]
-        doc += f"## {section}\n\n"
+    for section, items in sections.items():
+        parts.append(f"## {section}\n\n")
         
         for item in items:  # Preserve original order
-            name = item.get('name', item.get('id', 'Unknown'))
-            url = item['url']
-            doc += f"- [{name}]({url})\n"
+            parts.append(f"- [{item.name}]({item.url})\n")
         
-        doc += "\n"
+        parts.append("\n")
     
-    output_file.write_text(doc, encoding='utf-8')
+    output_file.write_text(''.join(parts), encoding='utf-8')
     print(f"[OK] Saved: {output_file.name} ({total} URLs)")
 
 
-async def main():
-    """Main execution."""
+async def extract_all_urls(browser, use_cache: bool = True):
+    """
+    Extract Reference and Docs URLs with one page of the given browser and write the indexes.
+    Returns the Reference page HTML (None if it failed to load).
+    """
+    page = await browser.new_page()
+    await page.route("**/*", block_static_assets)
+    
+    # Extract Reference URLs
+    reference_sections, reference_html = await extract_reference_urls(page, use_cache)
+    if reference_sections:
+        generate_url_document(
+            reference_sections, 
+            "Pine Script V6 Reference",
+            OUTPUT_DIR / "reference_urls.md"
+        )
+    
+    # Extract Docs URLs  
+    docs_sections = await extract_docs_urls(page, use_cache)
+    if docs_sections:
+        generate_url_document(
+            docs_sections,
+            "Pine Script V6 Documentation", 
+            OUTPUT_DIR / "docs_urls.md"
+        )
+        save_url_index(docs_sections, OUTPUT_DIR / "docs_urls.json")
+    
+    await page.close()
+    return reference_html
+
+
+def save_url_index(sections: dict, output_file: Path):
+    """Save the URL sections as JSON, the input format of extract_content.py."""
+    index = {section: [{'name': item.name, 'url': item.url} for item in items] for section, items in sections.items()}
+    output_file.write_bytes(orjson.dumps(index))
+    print(f"[OK] Saved: {output_file.name}")
+
+
+async def main(browser=None, use_cache: bool = True):
+    """
+    Main execution. Reuses `browser` when given (see run_all.py), otherwise launches one.
+    Returns the Reference page HTML so a following content extraction can reuse it.
+    use_cache=False refetches pages even if output/cache has a fresh copy.
+    """
     print("="*60)
     print("PINE SCRIPT V6 - URL EXTRACTOR")
     print("="*60)
@@ -208,34 +378,21 @@ async def main():
     # Create output directory
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        # Extract Reference URLs
-        reference_sections = await extract_reference_urls(page)
-        if reference_sections:
-            generate_url_document(
-                reference_sections, 
-                "Pine Script V6 Reference",
-                OUTPUT_DIR / "reference_urls.md"
-            )
-        
-        # Extract Docs URLs  
-        docs_sections = await extract_docs_urls(page)
-        if docs_sections:
-            generate_url_document(
-                docs_sections,
-                "Pine Script V6 Documentation", 
-                OUTPUT_DIR / "docs_urls.md"
-            )
-        
-        await browser.close()
+    if browser is not None:
+        reference_html = await extract_all_urls(browser, use_cache)
+    else:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            reference_html = await extract_all_urls(browser, use_cache)
+            await browser.close()
     
     print("\n" + "="*60)
     print("[OK] URL extraction complete!")
     print("="*60)
+    return reference_html
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Extract Pine Script v6 Reference and Docs URLs.")
+    parser.add_argument("--no-cache", action="store_true", help="refetch pages instead of reading output/cache")
+    asyncio.run(main(use_cache=not parser.parse_args().no_cache))
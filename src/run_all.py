@@ -3,43 +3,72 @@
 Pine Script V6 - Complete Extraction
 Runs URL and content extraction in sequence.
 
+All steps run in this process: modules are imported once and the Pine Script
+steps share a single Playwright browser instead of each starting its own
+interpreter and Chromium.
+
 Usage:
     python src/run_all.py
 """
 
+import argparse
 import asyncio
-import subprocess
 import sys
 from pathlib import Path
 
+from playwright.async_api import async_playwright
+
+import extract_content
+import extract_urls
+import run_apps_script
+
+
+async def pipeline(use_cache: bool = True):
+    """Run all extraction steps in order; returns the name of the step that failed, if any."""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        
+        # The Reference page HTML loaded for the URL index is reused for its content
+        results = {}
+        steps = [
+            ("URL Extraction", lambda: extract_urls.main(browser, use_cache)),
+            ("Content Extraction", lambda: extract_content.main(browser, results.get("URL Extraction"), use_cache)),
+            ("Apps Script Extraction", lambda: run_apps_script.run(save_urls=True)),
+        ]
+        
+        try:
+            for name, step in steps:
+                print(f"\n>>> Running: {name}")
+                print("-" * 40)
+                
+                try:
+                    results[name] = await step()
+                except Exception as e:
+                    print(f"\n[ERROR] {name} failed: {e}")
+                    return name
+        finally:
+            await browser.close()
+    
+    return None
+
+
 def main():
     """Run all extraction scripts in order."""
     root = Path(__file__).resolve().parent
     
+    parser = argparse.ArgumentParser(description="Run the complete Pine Script and Apps Script extraction.")
+    parser.add_argument("--no-cache", action="store_true", help="refetch Pine Script pages instead of reading output/cache")
+    args = parser.parse_args()
+    
+    # Same effect as the PYTHONIOENCODING=utf-8 the child processes used to get
+    sys.stdout.reconfigure(encoding='utf-8')
+    
     print("=" * 60)
     print("PINE SCRIPT V6 - COMPLETE EXTRACTION")
     print("=" * 60)
     
-    scripts = [
-        ("URL Extraction", root / "extract_urls.py"),
-        ("Content Extraction", root / "extract_content.py"),
-        ("Apps Script URL Extraction", root / "extract_apps_script_urls.py"),
-        ("Apps Script Content Extraction", root / "extract_apps_script_content.py"),
-    ]
-    
-    for name, script in scripts:
-        print(f"\n>>> Running: {name}")
-        print("-" * 40)
-        
-        result = subprocess.run(
-            [sys.executable, str(script)],
-            cwd=root.parent,
-            env={**__import__('os').environ, 'PYTHONIOENCODING': 'utf-8'}
-        )
-        
-        if result.returncode != 0:
-            print(f"\n[ERROR] {name} failed with code {result.returncode}")
-            sys.exit(1)
+    if asyncio.run(pipeline(use_cache=not args.no_cache)) is not None:
+        sys.exit(1)
     
     print("\n" + "=" * 60)
     print("[OK] All extractions complete!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Google Apps Script (ES-419) - Pipeline
+Collects section URLs and extracts their content in a single process.
+The URL index is handed to the content extractor in memory, and both
+phases share the same HTTP client (connection pool and cache) and browser.
+
+Usage:
+    python src/run_apps_script.py [--save-urls] [--gzip]
+"""
+
+import argparse
+import asyncio
+
+from playwright.async_api import async_playwright
+
+from extract_apps_script_content import extract_contents, flatten_sections, generate_content_document
+from extract_apps_script_urls import (
+    OUTPUT_DIR,
+    collect_urls,
+    create_http_client,
+    generate_url_document,
+    save_url_index,
+)
+
+
+async def run(save_urls: bool = False, compress: bool = False):
+    """Run URL collection and content extraction back to back."""
+    print("=" * 60)
+    print("GOOGLE APPS SCRIPT - PIPELINE")
+    print("=" * 60)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    async with create_http_client() as client, async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+
+        url_sections = await collect_urls(client, browser)
+        if save_urls:
+            generate_url_document(url_sections, OUTPUT_DIR / "apps_script_urls.md")
+            save_url_index(url_sections, OUTPUT_DIR / "apps_script_urls.json")
+
+        urls_to_crawl = flatten_sections(url_sections)
+        if not urls_to_crawl:
+            print("[ERROR] No Apps Script URLs found.")
+            await browser.close()
+            return
+
+        sections = await extract_contents(urls_to_crawl, client, browser)
+        await browser.close()
+
+    generate_content_document(sections, OUTPUT_DIR / "apps_script_content.md", compress=compress)
+
+    print("\n" + "=" * 60)
+    print("[OK] Apps Script pipeline complete!")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract Google Apps Script (ES-419) documentation.")
+    parser.add_argument(
+        "--save-urls",
+        action="store_true",
+        help="also write output/apps_script_urls.md and .json (debug artifacts)",
+    )
+    parser.add_argument("--gzip", action="store_true", help="write apps_script_content.md.gz instead of .md")
+    args = parser.parse_args()
+    asyncio.run(run(save_urls=args.save_urls, compress=args.gzip))
+
+
+if __name__ == "__main__":
+    main()
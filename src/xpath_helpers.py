@@ -0,0 +1,9 @@
+"""
+XPath helpers shared by the Pine Script and Apps Script extractors.
+Kept free of third-party imports so either side can use them without the other's dependencies.
+"""
+
+
+def has_class(name: str) -> str:
+    """XPath predicate matching elements whose class attribute contains the token `name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
@@ -0,0 +1,34 @@
+"""Reference item extraction against saved TradingView markup."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+# Third-party modules extract_content imports, directly or through extract_urls
+pytest.importorskip("playwright")
+pytest.importorskip("crawl4ai")
+pytest.importorskip("bs4")
+pytest.importorskip("orjson")
+
+import lxml.html  # noqa: E402
+
+from extract_content import extract_item_worker  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_items():
+    """(item_id, html) pairs for each top-level reference item in the fixture."""
+    html = (FIXTURES / "reference_items.html").read_text(encoding="utf-8")
+    root = lxml.html.fromstring(f"<div>{html}</div>")
+    return [(el.get("id"), lxml.html.tostring(el, encoding="unicode")) for el in root]
+
+
+def test_extract_item_worker_matches_expected_markdown():
+    expected = json.loads((FIXTURES / "reference_items.expected.json").read_text(encoding="utf-8"))
+    items = load_items()
+    
+    assert [item_id for item_id, _ in items] == [e["id"] for e in expected]
+    for item, want in zip(items, expected):
+        assert extract_item_worker(item) == want